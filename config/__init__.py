@@ -1,6 +1,33 @@
+import os
+import tempfile
+
+
 class Config:
     SECRET_KEY = 'clave_secreta_super_segura'
     
     # Configuración de conexión a MySQL
     SQLALCHEMY_DATABASE_URI = 'mysql+mysqlconnector://root:@localhost/facturacion_electronica'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Inserciones masivas: hasta 1000 filas por sentencia INSERT ... VALUES.
+    # pool_pre_ping descarta conexiones que MySQL cerró por inactividad
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'insertmanyvalues_page_size': 1000,
+        'pool_pre_ping': True,
+        'query_cache_size': 1200,  # sentencias compiladas en caché (por defecto 500)
+    }
+
+    # Tamaño máximo de subida (imágenes de productos)
+    MAX_CONTENT_LENGTH = 8 * 1024 * 1024
+
+    # Caché de los listados (segundos), en archivos: la comparten todos los
+    # workers de gunicorn, así que invalidarla en uno la invalida en todos
+    CACHE_TYPE = 'FileSystemCache'
+    CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'facturacion_cache'))
+    CACHE_DEFAULT_TIMEOUT = 30
+
+    # Caché del navegador para /static (1 año): las URLs llevan ?v=<mtime>
+    # (ver version_estaticos en app.py), así que cambian con el archivo.
+    # En producción /static/ lo sirve nginx directamente, sin pasar por Flask:
+    #   location /static/ { alias /app/static/; sendfile on; tcp_nopush on; expires 1y; }
+    SEND_FILE_MAX_AGE_DEFAULT = 31536000
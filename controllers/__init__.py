@@ -0,0 +1,13 @@
+# ====================================================
+# 🧩 CONTROLADORES (blueprints por módulo)
+# ====================================================
+from flask_caching import Cache
+
+# Caché compartida por los módulos; se inicializa en app.py
+cache = Cache()
+CLIENTES_CACHE_KEY = 'clientes_list'
+PRODUCTOS_CACHE_KEY = 'productos_list'
+
+from .clientes import clientes_bp  # noqa: E402
+from .productos import productos_bp  # noqa: E402
+from .ventas import ventas_bp  # noqa: E402
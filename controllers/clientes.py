@@ -0,0 +1,78 @@
+# ====================================================
+# 👥 MÓDULO DE CLIENTES
+# ====================================================
+from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask_login import login_required, current_user
+from models import db, Customer, Invoice
+
+from . import cache, CLIENTES_CACHE_KEY
+
+clientes_bp = Blueprint('clientes', __name__)
+
+
+@clientes_bp.route('/clientes')
+@login_required
+def clientes_listar():
+    # Se cachean solo los datos (no el HTML, que incluye usuario y mensajes flash)
+    clientes = cache.get(CLIENTES_CACHE_KEY)
+    if clientes is None:
+        clientes = db.session.query(
+            Customer.id, Customer.name, Customer.dui, Customer.nit,
+            Customer.email, Customer.phone, Customer.address
+        ).all()
+        cache.set(CLIENTES_CACHE_KEY, clientes)
+    return render_template('clientes.html', clientes=clientes, user=current_user)
+
+
+@clientes_bp.route('/clientes/agregar', methods=['POST'])
+@login_required
+def clientes_agregar():
+    nuevo = Customer(
+        name=request.form.get('nombre', ''),
+        dui=request.form.get('dui', ''),
+        nit=request.form.get('nit', ''),
+        email=request.form.get('email', ''),
+        phone=request.form.get('telefono', ''),
+        address=request.form.get('direccion', '')
+    )
+    db.session.add(nuevo)
+    db.session.commit()
+    cache.delete(CLIENTES_CACHE_KEY)
+    flash('Cliente agregado correctamente ✅', 'success')
+    return redirect(url_for('clientes.clientes_listar'))
+
+
+@clientes_bp.route('/clientes/editar/<int:id>', methods=['POST'])
+@login_required
+def clientes_editar(id):
+    cliente = Customer.query.get_or_404(id)
+    cliente.name = request.form.get('nombre', cliente.name)
+    cliente.dui = request.form.get('dui', cliente.dui)
+    cliente.nit = request.form.get('nit', cliente.nit)
+    cliente.email = request.form.get('email', cliente.email)
+    cliente.phone = request.form.get('telefono', cliente.phone)
+    cliente.address = request.form.get('direccion', cliente.address)
+    db.session.commit()
+    cache.delete(CLIENTES_CACHE_KEY)
+    flash('Cliente actualizado correctamente ✏️', 'info')
+    return redirect(url_for('clientes.clientes_listar'))
+
+
+@clientes_bp.route('/clientes/eliminar/<int:id>')
+@login_required
+def clientes_eliminar(id):
+    cliente = db.get_or_404(Customer, id)
+
+    # Verificar si tiene facturas asociadas (EXISTS se detiene en la primera)
+    tiene_facturas = db.session.query(
+        Invoice.query.filter_by(customer_id=id).exists()
+    ).scalar()
+    if tiene_facturas:
+        flash('❌ No se puede eliminar este cliente porque tiene facturas asociadas.', 'danger')
+        return redirect(url_for('clientes.clientes_listar'))
+
+    db.session.delete(cliente)
+    db.session.commit()
+    cache.delete(CLIENTES_CACHE_KEY)
+    flash('Cliente eliminado correctamente ✅', 'success')
+    return redirect(url_for('clientes.clientes_listar'))
@@ -0,0 +1,152 @@
+# ====================================================
+# 📦 MÓDULO DE PRODUCTOS
+# ====================================================
+from flask import Blueprint, current_app, render_template, redirect, url_for, request, flash
+from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
+from models import db, upsert_stock, Product, Stock, InvoiceItem, SaleItem
+from sqlalchemy import func, or_
+from sqlalchemy.orm import lazyload
+from pathlib import Path
+import math
+import shutil
+
+from . import cache, PRODUCTOS_CACHE_KEY
+
+productos_bp = Blueprint('productos', __name__)
+
+# 📂 Imágenes de los productos
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif'})
+_ALLOWED_SUFFIXES = tuple(f'.{ext}' for ext in ALLOWED_EXTENSIONS)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def allowed_file(filename):
+    """Valida extensión de imagen"""
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+
+def save_stream(archivo, destino, tam_bloque=UPLOAD_CHUNK_SIZE):
+    """Copia el archivo subido a disco por bloques grandes"""
+    with open(destino, 'wb') as salida:
+        shutil.copyfileobj(archivo.stream, salida, length=tam_bloque)
+
+
+@productos_bp.route('/productos')
+@login_required
+def productos_listar():
+    productos = cache.get(PRODUCTOS_CACHE_KEY)
+    if productos is None:
+        productos = (
+            db.session.query(
+                Product.id, Product.code, Product.name, Product.price,
+                Product.cost, Product.tax, Product.image_path,
+                (func.coalesce(func.sum(Stock.qty_milli), 0) / 1000.0).label('qty')
+            )
+            .outerjoin(Stock, Stock.product_id == Product.id)
+            .group_by(Product.id)
+            .all()
+        )
+        cache.set(PRODUCTOS_CACHE_KEY, productos)
+    return render_template('productos.html', productos=productos, user=current_user)
+
+
+@productos_bp.route('/productos/agregar', methods=['POST'])
+@login_required
+def productos_agregar():
+    nombre = request.form.get('nombre', '')
+    precio = float(request.form.get('precio', 0) or 0)
+    costo = float(request.form.get('costo', 0) or 0)
+    iva = float(request.form.get('iva', 0) or 0)
+    cantidad = float(request.form.get('cantidad', 0) or 0)
+    if not math.isfinite(cantidad):  # nan/inf no caben en stock.qty_milli
+        cantidad = 0.0
+    imagen = request.files.get('imagen')
+
+    filename = None
+    if imagen and allowed_file(imagen.filename):
+        filename = secure_filename(imagen.filename)
+        save_stream(imagen, Path(current_app.config['UPLOAD_FOLDER']) / filename)
+
+    # Creamos el producto sin code aún
+    nuevo = Product(
+        name=nombre,
+        price=precio,
+        cost=costo,
+        tax=iva,
+        image_path=filename
+    )
+    db.session.add(nuevo)
+    db.session.flush()  # obtiene nuevo.id
+
+    # Generar code tipo P-00001
+    nuevo.code = f"P-{nuevo.id:05d}"
+
+    # Crear stock inicial
+    stock = Stock(product_id=nuevo.id, qty=cantidad)
+    db.session.add(stock)
+
+    db.session.commit()
+    cache.delete(PRODUCTOS_CACHE_KEY)
+
+    flash(f'Producto agregado correctamente ✅ Código asignado: {nuevo.code}', 'success')
+    return redirect(url_for('productos.productos_listar'))
+
+
+@productos_bp.route('/productos/editar/<int:id>', methods=['POST'])
+@login_required
+def productos_editar(id):
+    # Sin cargar stock_items: el stock se fija con el upsert de más abajo
+    producto = db.get_or_404(Product, id, options=[lazyload(Product.stock_items)])
+    producto.name = request.form.get('nombre', producto.name)
+    producto.price = float(request.form.get('precio', producto.price))
+    producto.cost = float(request.form.get('costo', producto.cost))
+    producto.tax = float(request.form.get('iva', producto.tax))
+
+    cantidad_raw = request.form.get('cantidad')
+    imagen = request.files.get('imagen')
+
+    if imagen and allowed_file(imagen.filename):
+        filename = secure_filename(imagen.filename)
+        save_stream(imagen, Path(current_app.config['UPLOAD_FOLDER']) / filename)
+        producto.image_path = filename
+
+    cantidad = None
+    if cantidad_raw:
+        try:
+            cantidad = float(cantidad_raw)
+        except ValueError:
+            pass
+        if cantidad is not None and not math.isfinite(cantidad):
+            cantidad = None
+
+    # Crea la fila de stock si falta o fija la cantidad, en una sola sentencia
+    upsert_stock(id, cantidad)
+
+    db.session.commit()
+    cache.delete(PRODUCTOS_CACHE_KEY)
+    flash('Producto actualizado correctamente ✏️', 'info')
+    return redirect(url_for('productos.productos_listar'))
+
+
+@productos_bp.route('/productos/eliminar/<int:id>')
+@login_required
+def productos_eliminar(id):
+    producto = db.get_or_404(Product, id)
+
+    # Verificar si el producto aparece en alguna factura o venta
+    tiene_movimientos = db.session.query(or_(
+        InvoiceItem.query.filter_by(product_id=id).exists(),
+        SaleItem.query.filter_by(product_id=id).exists()
+    )).scalar()
+    if tiene_movimientos:
+        flash('❌ No se puede eliminar el producto porque está vinculado a facturas o ventas.', 'danger')
+        return redirect(url_for('productos.productos_listar'))
+
+    # El stock asociado se elimina por cascade en Product.stock_items
+    db.session.delete(producto)
+    db.session.commit()
+    cache.delete(PRODUCTOS_CACHE_KEY)
+
+    flash('Producto eliminado correctamente ✅', 'success')
+    return redirect(url_for('productos.productos_listar'))
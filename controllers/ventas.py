@@ -0,0 +1,358 @@
+# ====================================================
+# 💰 MÓDULO DE VENTAS / FACTURAS
+# ====================================================
+from flask import Blueprint, render_template, redirect, url_for, request, flash, Response
+from flask_login import login_required, current_user
+from models import db, eager, Customer, Product, Stock, Invoice, InvoiceItem, INVOICE_ITEM_INSERT
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload, lazyload, selectinload
+from datetime import date  # para fecha en ventas_nueva
+import math
+from tempfile import SpooledTemporaryFile
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
+
+from . import cache, PRODUCTOS_CACHE_KEY
+
+ventas_bp = Blueprint('ventas', __name__)
+
+VENTAS_PAGE_SIZE = 50  # facturas por página en el listado
+
+
+@ventas_bp.route('/ventas')
+@login_required
+def ventas():
+    """Listado de facturas (paginado, las más recientes primero)"""
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    # Pedimos una fila extra para saber si existe una página siguiente
+    facturas = db.session.scalars(
+        eager(db.select(Invoice), selectinload(Invoice.customer), lazyload(Invoice.items))
+        .order_by(Invoice.id.desc())
+        .limit(VENTAS_PAGE_SIZE + 1)
+        .offset((page - 1) * VENTAS_PAGE_SIZE)
+    ).all()
+    hay_siguiente = len(facturas) > VENTAS_PAGE_SIZE
+
+    return render_template(
+        'ventas.html',
+        facturas=facturas[:VENTAS_PAGE_SIZE],
+        page=page,
+        hay_siguiente=hay_siguiente,
+        user=current_user
+    )
+
+
+@ventas_bp.route('/ventas/nueva', methods=['GET', 'POST'])
+@login_required
+def ventas_nueva():
+    """Crea una nueva factura"""
+    if request.method == 'POST':
+        # 1. Cliente
+        try:
+            cliente_id = int(request.form.get('cliente', 0))
+        except ValueError:
+            flash('Cliente inválido ❌', 'danger')
+            return redirect(url_for('ventas.ventas_nueva'))
+
+        # 2. Items de la factura
+        # Parseamos el formulario una sola vez: {product_id: cantidad}
+        qty_by_id = {}
+        for key in request.form:
+            if key.startswith('producto_'):
+                product_id = int(key.split('_')[1])
+                qty_by_id[product_id] = request.form.get(f'cantidad_{product_id}', 0)
+
+        # Cargamos los productos en una sola consulta (evita N+1), sin su
+        # stock: el descuento se hace más abajo con un UPDATE en la BD
+        productos_by_id = {
+            p.id: p for p in Product.query
+            .options(lazyload(Product.stock_items))
+            .filter(Product.id.in_(qty_by_id)).all()
+        }
+
+        # Los montos se acumulan en centavos enteros (sin Decimal)
+        items = []
+        subtotal_cents = 0
+        iva_cents = 0
+
+        for product_id, cantidad_raw in qty_by_id.items():
+            # cantidad asociada al producto_X
+            try:
+                cantidad = float(cantidad_raw)
+            except (TypeError, ValueError):
+                cantidad = 0.0
+
+            if not math.isfinite(cantidad) or cantidad <= 0:
+                continue
+
+            producto = productos_by_id.get(product_id)
+            if not producto:
+                continue
+
+            # precio en centavos y tasa de IVA en puntos básicos (13% → 1300)
+            precio_cents = int(round(producto.price * 100))
+            tax_bp = int(round(producto.tax * 100))
+            subtotal_item_cents = int(round(precio_cents * cantidad))
+            iva_item_cents = (subtotal_item_cents * tax_bp + 5000) // 10000
+
+            subtotal_cents += subtotal_item_cents
+            iva_cents += iva_item_cents
+
+            items.append({
+                'product': producto,
+                'quantity': cantidad,
+                'price': precio_cents / 100.0
+            })
+
+        if not items:
+            flash('Debes seleccionar al menos un producto 📦', 'warning')
+            return redirect(url_for('ventas.ventas_nueva'))
+
+        total_cents = subtotal_cents + iva_cents
+
+        # 3. Crear la factura principal (code toma un valor provisional único)
+        nueva_factura = Invoice(
+            customer_id=cliente_id,
+            user_id=current_user.id,
+            subtotal=subtotal_cents / 100.0,
+            tax_total=iva_cents / 100.0,
+            total=total_cents / 100.0
+        )
+        db.session.add(nueva_factura)
+        db.session.flush()  # genera ID temporalmente antes del commit
+
+        # 4. Generar código final basado en ID
+        codigo = f"F-{nueva_factura.id:05d}"
+        nueva_factura.code = codigo
+
+        # 5. Insertar detalles (InvoiceItem) y descontar stock
+        # Un solo executemany para los detalles y otro para el stock
+        detalles = [
+            {
+                'invoice_id': nueva_factura.id,
+                'product_id': item['product'].id,
+                'quantity': item['quantity'],
+                'price': item['price']
+            }
+            for item in items
+        ]
+        db.session.execute(INVOICE_ITEM_INSERT, detalles)
+
+        # El descuento se hace en la BD (qty = max(qty - q, 0)) con un único
+        # UPDATE para todos los productos: CASE product_id WHEN ... THEN q
+        # (cantidades en milésimas, como se guardan en stock.qty_milli).
+        # Solo la bodega principal (location_id=1, la que usa upsert_stock):
+        # si un producto tiene varias bodegas no se descuenta en todas
+        stock_table = Stock.__table__
+        cantidad_vendida = case(
+            {item['product'].id: Stock.a_milli(item['quantity']) for item in items},
+            value=stock_table.c.product_id
+        )
+        db.session.execute(
+            stock_table.update()
+            .where(
+                stock_table.c.product_id.in_([item['product'].id for item in items]),
+                stock_table.c.location_id == 1
+            )
+            .values(qty_milli=case(
+                (stock_table.c.qty_milli > cantidad_vendida, stock_table.c.qty_milli - cantidad_vendida),
+                else_=0
+            ))
+        )
+
+        # 6. Guardar todo
+        db.session.commit()
+        cache.delete(PRODUCTOS_CACHE_KEY)
+
+        flash(f'Factura creada correctamente ✅ Código: {codigo}', 'success')
+        return redirect(url_for('ventas.ventas'))
+
+    # GET → mostrar formulario
+    # Solo se consultan las columnas que usa el formulario (sin hidratar modelos)
+    clientes = db.session.query(Customer.id, Customer.name).order_by(Customer.name).all()
+    productos = (
+        db.session.query(
+            Product.id,
+            Product.name,
+            Product.price,
+            Product.tax,
+            (func.coalesce(func.sum(Stock.qty_milli), 0) / 1000.0).label('qty')
+        )
+        .outerjoin(Stock, Stock.product_id == Product.id)
+        .group_by(Product.id)
+        .order_by(Product.name)
+        .all()
+    )
+
+    return render_template(
+        'ventas_nueva.html',
+        clientes=clientes,
+        productos=productos,
+        user=current_user,
+        date=date  # variable para {{ date.today() }} en la vista
+    )
+
+
+# Items de una factura con sus productos: cada producto distinto se carga una
+# sola vez (IN por id) y sin arrastrar su stock, que el detalle no usa
+_ITEMS_CON_PRODUCTO = (
+    selectinload(Invoice.items)
+    .selectinload(InvoiceItem.product)
+    .lazyload(Product.stock_items)
+)
+
+
+@ventas_bp.route('/ventas/<int:id>')
+@login_required
+def ventas_detalle(id):
+    """Detalle de una factura específica"""
+    factura = db.first_or_404(eager(
+        db.select(Invoice).filter_by(id=id),
+        joinedload(Invoice.customer),
+        _ITEMS_CON_PRODUCTO
+    ))
+
+    return render_template(
+        'ventas_detalle.html',
+        factura=factura,
+        user=current_user
+    )
+
+@ventas_bp.route('/ventas/eliminar/<int:id>', methods=['POST'])
+@login_required
+def ventas_eliminar(id):
+    """Elimina una factura existente, junto con sus items"""
+    factura = Invoice.query.get_or_404(id)
+
+    # Protección: no permitir eliminar si ya está registrada oficialmente
+    # (puedes quitar esta parte si no manejas estados de facturación)
+    # if factura.estado == 'emitida':
+    #     flash('❌ No se puede eliminar una factura ya emitida.', 'danger')
+    #     return redirect(url_for('ventas.ventas'))
+
+    try:
+        # Al tener cascade="all, delete-orphan" en Invoice.items,
+        # los InvoiceItem se eliminarán automáticamente.
+        db.session.delete(factura)
+        db.session.commit()
+        flash(f'Factura {factura.code} eliminada correctamente 🗑️', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('⚠️ No se pudo eliminar la factura. Verifica que no esté bloqueada.', 'danger')
+        print(e)
+
+    return redirect(url_for('ventas.ventas'))
+
+
+# ====================================================
+# 🧾 GENERAR PDF DE FACTURA
+# ====================================================
+PDF_SPOOL_MAX_SIZE = 1024 * 1024  # bytes en memoria antes de usar disco
+PDF_CHUNK_SIZE = 64 * 1024
+
+# Estilos del PDF: se construyen una sola vez al importar el módulo
+_STYLES = getSampleStyleSheet()
+_TABLE_COL_WIDTHS = (2.5*inch, 1*inch, 1.5*inch, 1.5*inch)
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+])
+
+
+def _leer_en_bloques(archivo, tam=PDF_CHUNK_SIZE):
+    """Genera el contenido de un archivo por bloques y lo cierra al terminar"""
+    try:
+        while True:
+            bloque = archivo.read(tam)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
+
+
+@ventas_bp.route('/ventas/<int:id>/pdf')
+@login_required
+def generar_factura_pdf(id):
+    """Genera y descarga la factura en formato PDF"""
+    factura = db.first_or_404(eager(
+        db.select(Invoice).filter_by(id=id),
+        joinedload(Invoice.customer),
+        joinedload(Invoice.user),
+        _ITEMS_CON_PRODUCTO
+    ))
+
+    # El PDF se escribe en memoria hasta 1 MB y luego pasa a disco
+    buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    doc = SimpleDocTemplate(
+        buffer, pagesize=letter,
+        rightMargin=40, leftMargin=40,
+        topMargin=60, bottomMargin=40
+    )
+    elements = []
+    styles = _STYLES
+
+    # === Encabezado ===
+    titulo = Paragraph(f"<b>Factura N° {factura.code}</b>", styles['Title'])
+    empresa = Paragraph("<b>DULCE VIDA - Sistema de Facturación</b>", styles['Heading3'])
+    cliente_info = Paragraph(f"""
+        <b>Cliente:</b> {factura.customer.name}<br/>
+        <b>DUI:</b> {factura.customer.dui or 'N/A'}<br/>
+        <b>Correo:</b> {factura.customer.email or 'N/A'}<br/>
+        <b>Dirección:</b> {factura.customer.address or 'N/A'}<br/>
+        <b>Fecha:</b> {factura.date.strftime('%d/%m/%Y %H:%M') if factura.date else '—'}<br/>
+        <b>Vendedor:</b> {factura.user.username if factura.user else '—'}
+    """, styles['Normal'])
+
+    elements += [empresa, Spacer(1, 8), titulo, Spacer(1, 12), cliente_info, Spacer(1, 12)]
+
+    # === Tabla de productos ===
+    data = [["Producto", "Cantidad", "Precio Unitario ($)", "Subtotal ($)"]]
+    for item in factura.items:
+        data.append([
+            item.product.name,
+            f"{item.quantity:.2f}",
+            f"{item.price:.2f}",
+            f"{item.subtotal:.2f}"
+        ])
+
+    # Totales
+    data.append(["", "", "Subtotal:", f"{factura.subtotal:.2f}"])
+    data.append(["", "", "IVA (13%):", f"{factura.tax_total:.2f}"])
+    data.append(["", "", "Total a Pagar:", f"{factura.total:.2f}"])
+
+    table = Table(data, colWidths=_TABLE_COL_WIDTHS)
+    table.setStyle(_TABLE_STYLE)
+
+    elements.append(table)
+    elements.append(Spacer(1, 20))
+
+    # === Firma ===
+    elements.append(Spacer(1, 20))
+    firma_texto = Paragraph(
+        f"<b>Firma:</b> ____________________________<br/>"
+        f"<i>{factura.user.username if factura.user else 'Usuario del sistema'}</i>",
+        styles['Normal']
+    )
+    elements.append(firma_texto)
+
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph("Gracias por su compra 💙", styles['Italic']))
+
+    doc.build(elements)
+    buffer.seek(0)
+
+    # Se envía por bloques, sin copiar el PDF completo a un bytes intermedio
+    response = Response(_leer_en_bloques(buffer), mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'inline; filename=Factura_{factura.code}.pdf'
+
+    return response
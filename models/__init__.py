@@ -1,29 +1,119 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from datetime import datetime
+from sqlalchemy import DateTime, insert, inspect
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import configure_mappers, raiseload
+from sqlalchemy.sql.expression import FunctionElement
+from uuid import uuid4
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+
+def _cargado(obj):
+    """Atributos ya cargados de una instancia (sin disparar consultas)"""
+    return inspect(obj).dict if obj is not None else {}
+
+
+def codigo_temporal(prefijo):
+    """Código único provisional; el controlador lo reemplaza por el definitivo
+    (basado en el id) dentro de la misma transacción, sin consultar MAX(code)"""
+    return lambda: f"{prefijo}{uuid4().hex[:16]}"
+
+
+class utcnow(FunctionElement):
+    """Fecha y hora actual en UTC calculada por la BD (como los datos
+    históricos, escritos con datetime.utcnow()); NOW() usaría la zona de la sesión"""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    # SQLite: CURRENT_TIMESTAMP ya es UTC
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'mysql')
+def _utcnow_mysql(element, compiler, **kw):
+    return 'UTC_TIMESTAMP()'
+
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_pg(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+def upsert_stock(product_id, qty=None, location_id=1):
+    """Crea o actualiza el stock de un producto en una sola sentencia
+    (INSERT ... ON DUPLICATE KEY / ON CONFLICT), sin SELECT previo.
+    Con qty=None solo garantiza que la fila exista (qty 0 si es nueva)."""
+    valores = {
+        'product_id': product_id,
+        'location_id': location_id,
+        'qty_milli': Stock.a_milli(qty) if qty is not None else 0,
+    }
+    dialecto = db.session.get_bind().dialect.name
+
+    if dialecto == 'mysql':
+        stmt = mysql_insert(Stock).values(**valores)
+        if qty is None:
+            stmt = stmt.on_duplicate_key_update(product_id=stmt.inserted.product_id)
+        else:
+            stmt = stmt.on_duplicate_key_update(
+                qty_milli=stmt.inserted.qty_milli, updated_at=utcnow()
+            )
+    else:
+        insert_dialecto = pg_insert if dialecto == 'postgresql' else sqlite_insert
+        stmt = insert_dialecto(Stock).values(**valores)
+        if qty is None:
+            stmt = stmt.on_conflict_do_nothing(index_elements=['product_id', 'location_id'])
+        else:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['product_id', 'location_id'],
+                set_={'qty_milli': stmt.excluded.qty_milli, 'updated_at': utcnow()}
+            )
+
+    db.session.execute(stmt)
+
+
+def eager(stmt, *loaders):
+    """Aplica los loaders indicados a la consulta. En debug y en tests añade
+    raiseload('*'), así cualquier relación no declarada lanza error (evita N+1)"""
+    if current_app.debug or current_app.testing:
+        loaders += (raiseload('*'),)
+    return stmt.options(*loaders)
+
 # ======================================================
 # 🧍 Modelo de Usuarios
 # ======================================================
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Índice único explícito: el login busca siempre por username
+        db.Index('ix_users_username', 'username', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), unique=True, nullable=False)
+    username = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(50), nullable=False, default='empleado')
     status = db.Column(db.SmallInteger, default=1)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
 
-    # Relaciones
-    sales = db.relationship('Sale', backref='user', lazy=True)
-    invoices = db.relationship('Invoice', backref='user', lazy=True)
+    # Relaciones (poco usadas desde el usuario: lazy="raise" detecta cargas accidentales)
+    sales = db.relationship('Sale', back_populates='user', lazy='raise', passive_deletes=True)
+    invoices = db.relationship('Invoice', back_populates='user', lazy='raise', passive_deletes=True)
 
     # Métodos de seguridad
+    # werkzeug calcula el hash con hashlib (scrypt / pbkdf2_hmac de OpenSSL, en C);
+    # el resultado lleva el método en el prefijo, así que hashes viejos siguen valiendo
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -45,12 +135,12 @@ class Customer(db.Model):
     phone = db.Column(db.String(20))
     address = db.Column(db.String(255))
     status = db.Column(db.SmallInteger, default=1)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relaciones
-    sales = db.relationship('Sale', backref='customer', lazy=True)
-    invoices = db.relationship('Invoice', backref='customer', lazy=True)
+    sales = db.relationship('Sale', back_populates='customer', lazy='raise', passive_deletes=True)
+    invoices = db.relationship('Invoice', back_populates='customer', lazy='raise', passive_deletes=True)
 
 
 # ======================================================
@@ -68,9 +158,11 @@ class Product(db.Model):
     image_path = db.Column(db.String(255))
 
     # Relaciones
-    stock_items = db.relationship('Stock', backref='product', cascade="all, delete-orphan", lazy=True)
-    invoice_items = db.relationship('InvoiceItem', backref='product', cascade="all, delete-orphan", lazy=True)
-    sale_items = db.relationship('SaleItem', backref='product', cascade="all, delete-orphan", lazy=True)
+    stock_items = db.relationship('Stock', back_populates='product', cascade="all, delete-orphan", lazy='selectin')
+    # Solo lectura inversa: sin cascade (no se escanean en cada flush) y con
+    # RESTRICT en la BD, así borrar un producto con ventas/facturas falla
+    invoice_items = db.relationship('InvoiceItem', back_populates='product', passive_deletes=True, lazy='raise')
+    sale_items = db.relationship('SaleItem', back_populates='product', passive_deletes=True, lazy='raise')
 
 
 # ======================================================
@@ -78,12 +170,42 @@ class Product(db.Model):
 # ======================================================
 class Stock(db.Model):
     __tablename__ = 'stock'
+    __table_args__ = (
+        # Una fila por producto y bodega; también sirve de índice por product_id
+        db.UniqueConstraint('product_id', 'location_id', name='uq_stock_loc'),
+        {
+            'mysql_engine': 'InnoDB',
+            'mysql_row_format': 'DYNAMIC',
+        },
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    qty = db.Column(db.Numeric(12, 3), default=0)
-    location_id = db.Column(db.Integer, default=1)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Cantidad en milésimas de unidad (entero): 1.5 unidades → 1500
+    qty_milli = db.Column(db.BigInteger, default=0)
+    location_id = db.Column(db.SmallInteger, default=1)  # pocas bodegas: 2 bytes bastan
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
+
+    # Relaciones
+    product = db.relationship('Product', back_populates='stock_items')
+
+    @staticmethod
+    def a_milli(cantidad):
+        """Convierte unidades a milésimas (entero)"""
+        return int(round(float(cantidad) * 1000))
+
+    # qty en unidades, solo para presentación y formularios
+    @hybrid_property
+    def qty(self):
+        return (self.qty_milli or 0) / 1000.0
+
+    @qty.setter
+    def qty(self, value):
+        self.qty_milli = Stock.a_milli(value)
+
+    @qty.expression
+    def qty(cls):
+        return cls.qty_milli / 1000.0
 
 
 # ======================================================
@@ -91,18 +213,29 @@ class Stock(db.Model):
 # ======================================================
 class Sale(db.Model):
     __tablename__ = 'sales'
+    __table_args__ = (
+        # Ventas de un usuario por fecha (también cubre búsquedas por user_id)
+        db.Index('ix_sale_user_created', 'user_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    sale_number = db.Column(db.String(50), unique=True)
+    sale_number = db.Column(db.String(50), unique=True, default=codigo_temporal('TMP-'))
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'))
-    total = db.Column(db.Numeric(12, 2), default=0)
-    paid_with = db.Column(db.String(50), default='EFECTIVO')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Al borrar el cliente la BD deja la venta sin cliente (Customer.sales es passive_deletes)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='SET NULL'), index=True)
+    total = db.Column(db.Numeric(12, 2, asdecimal=False), default=0)
+    # ENUM nativo (1 byte en MySQL) en vez de VARCHAR(50)
+    paid_with = db.Column(
+        db.Enum('EFECTIVO', 'TARJETA', 'TRANSFERENCIA', 'CHEQUE', name='paymethod'),
+        default='EFECTIVO', nullable=False
+    )
+    created_at = db.Column(db.DateTime, server_default=utcnow(), index=True)
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relaciones
-    items = db.relationship('SaleItem', backref='sale', cascade="all, delete-orphan", lazy=True)
+    user = db.relationship('User', back_populates='sales')
+    customer = db.relationship('Customer', back_populates='sales')
+    items = db.relationship('SaleItem', back_populates='sale', cascade="all, delete-orphan", lazy='selectin')
 
 
 # ======================================================
@@ -110,14 +243,24 @@ class Sale(db.Model):
 # ======================================================
 class SaleItem(db.Model):
     __tablename__ = 'sale_items'
+    __table_args__ = (
+        # Cubre la carga de items por venta (selectin) y el filtro por producto
+        db.Index('ix_saleitem_sale_product', 'sale_id', 'product_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    qty = db.Column(db.Numeric(12, 3), default=1)
-    price = db.Column(db.Numeric(10, 2), default=0)
-    tax = db.Column(db.Numeric(5, 2), default=0)
-    subtotal = db.Column(db.Numeric(12, 2), default=0)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='RESTRICT'), nullable=False, index=True)
+    # asdecimal=False: el driver devuelve float (como en Invoice), sin Decimal
+    qty = db.Column(db.Numeric(12, 3, asdecimal=False), default=1)
+    price = db.Column(db.Numeric(10, 2, asdecimal=False), default=0)
+    tax = db.Column(db.Numeric(5, 2, asdecimal=False), default=0)
+    # Columna generada por la BD (STORED): siempre igual a qty * price
+    subtotal = db.Column(db.Numeric(12, 2, asdecimal=False), db.Computed('qty * price', persisted=True))
+
+    # Relaciones
+    sale = db.relationship('Sale', back_populates='items')
+    product = db.relationship('Product', back_populates='sale_items')
 
 
 # ======================================================
@@ -125,21 +268,32 @@ class SaleItem(db.Model):
 # ======================================================
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        # Facturas por cliente ordenadas/filtradas por fecha (reportes)
+        db.Index('ix_invoices_customer_date', 'customer_id', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    code = db.Column(db.String(20), unique=True, nullable=False)
+    code = db.Column(db.String(20), unique=True, nullable=False, default=codigo_temporal('TMP-'))
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    date = db.Column(db.DateTime, server_default=utcnow(), index=True)
     subtotal = db.Column(db.Float, nullable=False, default=0.0)
     tax_total = db.Column(db.Float, nullable=False, default=0.0)
     total = db.Column(db.Float, nullable=False, default=0.0)
 
+    # Relaciones
+    user = db.relationship('User', back_populates='invoices')
+    customer = db.relationship('Customer', back_populates='invoices')
+
     # ✅ Relación con los items (detalle)
-    items = db.relationship('InvoiceItem', backref='invoice', cascade="all, delete-orphan", lazy=True)
+    items = db.relationship('InvoiceItem', back_populates='invoice', cascade="all, delete-orphan", lazy='selectin')
 
     def __repr__(self):
-        return f"<Factura {self.code} - Cliente {self.customer.name if self.customer else 'Sin cliente'}>"
+        # Solo usa lo ya cargado: el repr (logs, trazas) nunca consulta la BD
+        datos = _cargado(self)
+        cliente = _cargado(datos.get('customer')).get('name') or f"id={datos.get('customer_id')}"
+        return f"<Factura {datos.get('code')} - Cliente {cliente}>"
 
 
 # ======================================================
@@ -149,13 +303,28 @@ class InvoiceItem(db.Model):
     __tablename__ = 'invoice_items'
 
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='RESTRICT'), nullable=False, index=True)
     quantity = db.Column(db.Float, nullable=False)
     price = db.Column(db.Float, nullable=False)
-    subtotal = db.Column(db.Float, nullable=False)
+    # Columna generada por la BD (STORED): siempre igual a quantity * price
+    # (DOUBLE en MySQL: FLOAT es de precisión simple y redondearía el producto)
+    subtotal = db.Column(db.Double, db.Computed('quantity * price', persisted=True))
+
+    # Relaciones
+    invoice = db.relationship('Invoice', back_populates='items')
+    product = db.relationship('Product', back_populates='invoice_items')
 
     def __repr__(self):
-        return f"<Item {self.product.name if self.product else 'Producto'} x {self.quantity}>"
+        datos = _cargado(self)
+        nombre = _cargado(datos.get('product')).get('name') or f"Producto id={datos.get('product_id')}"
+        return f"<Item {nombre} x {datos.get('quantity')}>"
+
+
+# Resuelve todas las relaciones una sola vez al importar el módulo (y falla
+# aquí, no en la primera petición, si alguna está mal declarada)
+configure_mappers()
 
-        return f"<Item {self.product.name} x {self.quantity}>"
+# Sentencia de inserción masiva construida una sola vez y reutilizada:
+# db.session.execute(INVOICE_ITEM_INSERT, filas)
+INVOICE_ITEM_INSERT = insert(InvoiceItem)